@@ -7,7 +7,107 @@ utilizando la lógica de negocio del módulo logica_cotizador.
 import tkinter as tk
 from tkinter import ttk, messagebox
 import platform
-from logica_cotizador import GestorCotizaciones, OPENPYXL_DISPONIBLE
+import bisect
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from logica_cotizador import GestorCotizaciones
+
+# Sistema operativo, detectado una sola vez al importar el módulo
+_SISTEMA = platform.system()
+
+# Fuente del sistema según la plataforma
+if _SISTEMA == "Windows":
+    _FUENTE_SISTEMA = "Segoe UI"
+elif _SISTEMA == "Darwin":  # macOS
+    _FUENTE_SISTEMA = "SF Pro Text"
+else:  # Linux y otros
+    _FUENTE_SISTEMA = "DejaVu Sans"
+
+# Texto aceptado en el campo de precio mientras se escribe: dígitos con, a lo
+# sumo, un separador decimal (punto o coma)
+_PATRON_PRECIO = re.compile(r"\d*[.,]?\d*")
+
+# Colores principales (esquema moderno)
+COLOR_BG = "#f5f5f7"           # Fondo claro
+COLOR_ACCENT = "#0071e3"       # Azul acento
+COLOR_ACCENT_HOVER = "#0077ed" # Azul acento hover
+COLOR_TEXT = "#1d1d1f"         # Texto casi negro
+COLOR_SECONDARY = "#86868b"    # Gris secundario
+COLOR_SUCCESS = "#34c759"      # Verde éxito
+
+# Estilos ttk de la aplicación como pares (nombre, opciones), en orden de aplicación
+ESTILOS = (
+    # Marcos
+    ('TFrame', {'background': COLOR_BG}),
+    ('Main.TFrame', {'background': COLOR_BG}),
+    
+    # Etiquetas
+    ('TLabel', {'font': (_FUENTE_SISTEMA, 10),
+                'background': COLOR_BG,
+                'foreground': COLOR_TEXT}),
+    ('Title.TLabel', {'font': (_FUENTE_SISTEMA, 16, 'bold'),
+                      'padding': (0, 10),
+                      'background': COLOR_BG,
+                      'foreground': COLOR_TEXT}),
+    ('Header.TLabel', {'font': (_FUENTE_SISTEMA, 12, 'bold'),
+                       'background': COLOR_BG,
+                       'foreground': COLOR_TEXT}),
+    ('Status.TLabel', {'font': (_FUENTE_SISTEMA, 9),
+                       'background': "#e5e5e7",
+                       'foreground': COLOR_SECONDARY,
+                       'padding': (10, 5)}),
+    ('Total.TLabel', {'font': (_FUENTE_SISTEMA, 12, 'bold'),
+                      'background': COLOR_BG,
+                      'foreground': COLOR_ACCENT}),
+    
+    # Botones
+    ('TButton', {'font': (_FUENTE_SISTEMA, 10),
+                 'padding': (10, 5)}),
+    ('Accent.TButton', {'font': (_FUENTE_SISTEMA, 10, 'bold'),
+                        'background': COLOR_ACCENT,
+                        'foreground': COLOR_TEXT}),
+    # Botones de acción (→/←)
+    ('Action.TButton', {'font': (_FUENTE_SISTEMA, 12, 'bold'),
+                        'padding': (6, 8),
+                        'width': 3}),
+    
+    # Combobox
+    ('TCombobox', {'font': (_FUENTE_SISTEMA, 10),
+                   'padding': (5, 2)}),
+    
+    # Treeview (listas)
+    ('Treeview', {'font': (_FUENTE_SISTEMA, 10),
+                  'rowheight': 25,
+                  'background': "white",
+                  'fieldbackground': "white",
+                  'foreground': COLOR_TEXT}),
+    ('Treeview.Heading', {'font': (_FUENTE_SISTEMA, 10, 'bold'),
+                          'background': COLOR_BG,
+                          'foreground': COLOR_TEXT}),
+    
+    # LabelFrame
+    ('TLabelframe', {'background': COLOR_BG}),
+    ('TLabelframe.Label', {'font': (_FUENTE_SISTEMA, 11, 'bold'),
+                           'background': COLOR_BG,
+                           'foreground': COLOR_TEXT}),
+    
+    # Tooltip
+    ('Tooltip.TFrame', {'background': "#333333"}),
+    ('Tooltip.TLabel', {'font': (_FUENTE_SISTEMA, 9),
+                        'background': "#333333",
+                        'foreground': "white"}),
+)
+
+# Mapeos de colores según el estado del widget, como pares (nombre, opciones)
+MAPEOS_ESTILO = (
+    # Efectos al pasar el ratón sobre los botones de acento
+    ('Accent.TButton', {'background': [('active', COLOR_ACCENT_HOVER), ('pressed', COLOR_ACCENT_HOVER)],
+                        'foreground': [('active', 'white'), ('pressed', 'white')]}),
+    # Filas seleccionadas en las listas
+    ('Treeview', {'background': [('selected', COLOR_ACCENT)],
+                  'foreground': [('selected', 'white')]}),
+)
 
 class Tooltip:
     """
@@ -24,20 +124,16 @@ class Tooltip:
         """
         self.widget = widget
         self.text = text
-        self.tooltip = None
+        self.tooltip = None  # Ventana del tooltip, creada en el primer uso
+        self._after_id = None  # Ocultamiento automático pendiente
         self.widget.bind("<Enter>", self.show_tooltip)
         self.widget.bind("<Leave>", self.hide_tooltip)
     
-    def show_tooltip(self, event=None):
-        """Muestra el tooltip cerca del cursor."""
-        x, y, _, _ = self.widget.bbox("insert")
-        x += self.widget.winfo_rootx() + 25
-        y += self.widget.winfo_rooty() + 25
-        
-        # Crear ventana de tooltip
+    def _crear_ventana(self):
+        """Construye (una sola vez) la ventana del tooltip, inicialmente oculta."""
         self.tooltip = tk.Toplevel(self.widget)
+        self.tooltip.withdraw()
         self.tooltip.wm_overrideredirect(True)  # Sin decoración de ventana
-        self.tooltip.wm_geometry(f"+{x}+{y}")
         
         # Marco para el contenido
         frame = ttk.Frame(self.tooltip, style="Tooltip.TFrame", padding=4)
@@ -47,15 +143,34 @@ class Tooltip:
         label = ttk.Label(frame, text=self.text, style="Tooltip.TLabel", 
                           wraplength=250, justify="left")
         label.pack()
+    
+    def show_tooltip(self, event=None):
+        """Muestra el tooltip cerca del cursor."""
+        x, y, _, _ = self.widget.bbox("insert")
+        x += self.widget.winfo_rootx() + 25
+        y += self.widget.winfo_rooty() + 25
         
-        # Programar la desaparición automática después de 3 segundos
-        self.widget.after(3000, self.hide_tooltip)
+        # Reutilizar la ventana del tooltip entre apariciones
+        if self.tooltip is None:
+            self._crear_ventana()
+        self.tooltip.wm_geometry(f"+{x}+{y}")
+        self.tooltip.deiconify()
+        self.tooltip.lift()
+        
+        # Programar la desaparición automática después de 3 segundos,
+        # descartando la de una aparición anterior
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(3000, self.hide_tooltip)
     
     def hide_tooltip(self, event=None):
         """Oculta el tooltip si está visible."""
-        if self.tooltip:
-            self.tooltip.destroy()
-            self.tooltip = None
+        # Cancelar el ocultamiento automático si el cursor salió antes
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if self.tooltip is not None:
+            self.tooltip.withdraw()
 
 class CotizadorApp:
     """
@@ -64,6 +179,15 @@ class CotizadorApp:
     delegando la lógica de negocio a un objeto GestorCotizaciones.
     """
     
+    # Milisegundos de espera antes de aplicar el filtro por categoría
+    RETARDO_FILTRO_MS = 80
+    
+    # Indica si los estilos ttk ya se registraron en esta ejecución
+    _ESTILO_CONFIGURADO = False
+    
+    # Tags de colores alternos para filas pares e impares, indexados con i & 1
+    TAGS_ALTERNOS = (('even',), ('odd',))
+    
     def __init__(self, root):
         """
         Inicializa la aplicación de cotizaciones para festivales.
@@ -76,13 +200,43 @@ class CotizadorApp:
         self.root.geometry("1000x650")
         self.root.minsize(900, 600)
         
+        # Filas actualmente presentes en cada Treeview.
+        # La clave es la tupla (nombre, precio, categoria), única en la base del
+        # gestor, y el valor es [iid, valores, tags, visible], lo que permite
+        # actualizar solo lo que cambió.
+        # El iid de cada fila es el identificador entero del gestor, de modo que
+        # los manejadores de eventos recuperan el ítem con gestor.obtener_cotizacion.
+        self._iids_disponibles = {}
+        self._iids_seleccionadas = {}
+        
+        # Identificador del filtrado pendiente programado con after()
+        self._filtro_after_id = None
+        
+        # Categoría aplicada en el último filtrado ("Todas" al iniciar)
+        self._categoria_filtrada = "Todas"
+        
+        # Listas con un refresco pendiente en el próximo ciclo de inactividad
+        self._refrescos_pendientes = set()
+        
+        # Hilo de trabajo para las tareas de archivo (exportación a Excel),
+        # reutilizado entre guardados para no bloquear el bucle de Tk
+        self._ejecutor_io = ThreadPoolExecutor(max_workers=1)
+        
+        # Identificador de la consulta programada con after() sobre la
+        # exportación en curso
+        self._sondeo_exportacion_id = None
+        
+        # Diálogos reutilizables, construidos la primera vez que se abren
+        self._abrir_dialog_nueva = None
+        self._abrir_dialog_comentario = None
+        
         # Variable para mensajes de estado
         self.status_message = tk.StringVar()
         self.status_message.set("Listo")
         
-        # Crear el gestor de lógica de negocio
-        self.gestor = GestorCotizaciones()
-        self.gestor.cargar_cotizaciones_iniciales()
+        # Crear el gestor de lógica de negocio, sin leer todavía el archivo JSON:
+        # la lectura se hace en _carga_inicial, con la ventana ya dibujada
+        self.gestor = GestorCotizaciones(cargar=False)
         
         # Configurar el estilo
         self.configurar_estilo()
@@ -90,20 +244,64 @@ class CotizadorApp:
         # Crear el marco principal
         self.crear_interfaz()
         
-        # Inicializar las listas
+        # Mostrar una fila provisional mientras se completa la carga inicial. La
+        # lista no admite selección hasta entonces: la fila provisional no es una
+        # cotización y los manejadores esperan identificadores numéricos.
+        self.tree_disponibles.configure(selectmode='none')
+        self._iid_cargando = self.tree_disponibles.insert('', tk.END, values=("Cargando…", "", ""))
+        self.status_message.set("Cargando cotizaciones…")
+        
+        # Inicializar las listas cuando la ventana ya se haya dibujado
+        self.root.after_idle(self._carga_inicial)
+        
+        # Detener el hilo de trabajo al cerrar la ventana
+        self.root.protocol("WM_DELETE_WINDOW", self._al_cerrar)
+    
+    def _al_cerrar(self):
+        """
+        Cierra la ventana principal. Espera a que termine una exportación en
+        curso, para no dejar el archivo a medio escribir, y detiene el hilo de trabajo.
+        """
+        if self._sondeo_exportacion_id is not None:
+            self.root.after_cancel(self._sondeo_exportacion_id)
+            self._sondeo_exportacion_id = None
+        self._ejecutor_io.shutdown(wait=True, cancel_futures=True)
+        self.root.destroy()
+    
+    def _carga_inicial(self):
+        """
+        Carga las cotizaciones desde el archivo JSON y llena las listas por
+        primera vez. Se ejecuta en tiempo de inactividad para que la ventana
+        principal se muestre antes de leer el archivo e insertar las filas.
+        """
+        self.gestor.cargar_cotizaciones_desde_json()
+        
+        # Cargar las categorías en el filtro
+        self._valores_filtro = ["Todas", *self.gestor.categorias]
+        self.combo_categoria['values'] = self._valores_filtro
+        
+        # Reemplazar la fila provisional por las listas reales
+        self.tree_disponibles.delete(self._iid_cargando)
+        self.tree_disponibles.configure(selectmode='browse')
         self.actualizar_lista_disponibles()
         self.actualizar_lista_seleccionadas()
     
     def configurar_estilo(self):
-        """Configura el estilo visual de la aplicación."""
+        """
+        Configura el estilo visual de la aplicación.
+        Los estilos se registran una sola vez; las instancias posteriores de
+        CotizadorApp reutilizan la configuración existente.
+        """
+        if CotizadorApp._ESTILO_CONFIGURADO:
+            return
+        
         estilo = ttk.Style()
         
-        # Detectar sistema operativo para elegir el tema más adecuado
-        sistema = platform.system()
-        if sistema == "Windows":
+        # Elegir el tema más adecuado para el sistema operativo
+        if _SISTEMA == "Windows":
             # En Windows, 'vista' suele verse mejor
             estilo.theme_use('vista')
-        elif sistema == "Darwin":  # macOS
+        elif _SISTEMA == "Darwin":  # macOS
             # En macOS, el tema por defecto suele ser adecuado
             pass
         else:  # Linux y otros
@@ -114,119 +312,13 @@ class CotizadorApp:
                 # Si 'alt' no está disponible, usar el tema predeterminado
                 pass
         
-        # Colores principales (esquema moderno)
-        COLOR_BG = "#f5f5f7"           # Fondo claro
-        COLOR_ACCENT = "#0071e3"       # Azul acento
-        COLOR_ACCENT_HOVER = "#0077ed" # Azul acento hover
-        COLOR_TEXT = "#1d1d1f"         # Texto casi negro
-        COLOR_SECONDARY = "#86868b"    # Gris secundario
-        COLOR_SUCCESS = "#34c759"      # Verde éxito
-        
-        # Determinar la fuente del sistema según la plataforma
-        if sistema == "Windows":
-            fuente_sistema = "Segoe UI"
-        elif sistema == "Darwin":  # macOS
-            fuente_sistema = "SF Pro Text"
-        else:  # Linux y otros
-            fuente_sistema = "DejaVu Sans"
-        
-        # Configurar estilos para los marcos
-        estilo.configure('TFrame', background=COLOR_BG)
-        estilo.configure('Main.TFrame', background=COLOR_BG)
-        
-        # Configurar estilos para etiquetas
-        estilo.configure('TLabel', 
-                        font=(fuente_sistema, 10),
-                        background=COLOR_BG, 
-                        foreground=COLOR_TEXT)
-        
-        estilo.configure('Title.TLabel', 
-                        font=(fuente_sistema, 16, 'bold'),
-                        padding=(0, 10),
-                        background=COLOR_BG, 
-                        foreground=COLOR_TEXT)
-        
-        estilo.configure('Header.TLabel', 
-                        font=(fuente_sistema, 12, 'bold'),
-                        background=COLOR_BG, 
-                        foreground=COLOR_TEXT)
-        
-        estilo.configure('Status.TLabel', 
-                        font=(fuente_sistema, 9),
-                        background="#e5e5e7", 
-                        foreground=COLOR_SECONDARY,
-                        padding=(10, 5))
-        
-        estilo.configure('Total.TLabel', 
-                        font=(fuente_sistema, 12, 'bold'),
-                        background=COLOR_BG, 
-                        foreground=COLOR_ACCENT)
-        
-        # Configurar estilos para botones
-        estilo.configure('TButton', 
-                        font=(fuente_sistema, 10),
-                        padding=(10, 5))
-                        
-        estilo.configure('Accent.TButton', 
-                        font=(fuente_sistema, 10, 'bold'),
-                        background=COLOR_ACCENT,
-                        foreground=COLOR_TEXT)
-        # Mapeo de colores para efectos al pasar el ratón sobre botones
-        estilo.map('Accent.TButton',
-                background=[('active', COLOR_ACCENT_HOVER), ('pressed', COLOR_ACCENT_HOVER)],
-                foreground=[('active', 'white'), ('pressed', 'white')])
-        
-        # Estilo para botones de acción (→/←)
-        estilo.configure('Action.TButton', 
-                        font=(fuente_sistema, 12, 'bold'),
-                        padding=(6, 8),
-                        width=3)
-        
-        # Mapeo de colores para efectos al pasar el ratón sobre botones
-        estilo.map('Accent.TButton',
-                background=[('active', COLOR_ACCENT_HOVER), ('pressed', COLOR_ACCENT_HOVER)],
-                foreground=[('active', 'white'), ('pressed', 'white')])
-        
-        # Configurar estilos para los combobox
-        estilo.configure('TCombobox', 
-                        font=(fuente_sistema, 10),
-                        padding=(5, 2))
-        
-        # Configurar Treeview (listas)
-        estilo.configure('Treeview', 
-                        font=(fuente_sistema, 10),
-                        rowheight=25,
-                        background="white",
-                        fieldbackground="white",
-                        foreground=COLOR_TEXT)
-        
-        estilo.configure('Treeview.Heading', 
-                        font=(fuente_sistema, 10, 'bold'),
-                        background=COLOR_BG,
-                        foreground=COLOR_TEXT)
-        
-        # Configurar colores alternos para filas en Treeview
-        estilo.map('Treeview', 
-                background=[('selected', COLOR_ACCENT)],
-                foreground=[('selected', 'white')])
-        
-        # Estilo para LabelFrame
-        estilo.configure('TLabelframe', 
-                        background=COLOR_BG)
-        
-        estilo.configure('TLabelframe.Label', 
-                        font=(fuente_sistema, 11, 'bold'),
-                        background=COLOR_BG,
-                        foreground=COLOR_TEXT)
-        
-        # Estilo para tooltip
-        estilo.configure('Tooltip.TFrame',
-                        background="#333333")
-        
-        estilo.configure('Tooltip.TLabel',
-                        font=(fuente_sistema, 9),
-                        background="#333333",
-                        foreground="white")
+        # Aplicar los estilos y mapeos de colores definidos a nivel de módulo
+        for nombre, opciones in ESTILOS:
+            estilo.configure(nombre, **opciones)
+        for nombre, opciones in MAPEOS_ESTILO:
+            estilo.map(nombre, **opciones)
+        
+        CotizadorApp._ESTILO_CONFIGURADO = True
     
     def crear_interfaz(self):
         """Crea la interfaz gráfica de la aplicación."""
@@ -258,14 +350,14 @@ class CotizadorApp:
         
         ttk.Label(marco_filtro, text="Filtrar por categoría:").pack(side=tk.LEFT, padx=(0, 5))
         
-        # Obtener categorías únicas de las cotizaciones
-        categorias = self.gestor.obtener_categorias_unicas()
-        categorias.insert(0, "Todas")  # Añadir opción para mostrar todas
+        # Categorías únicas de las cotizaciones, con la opción para mostrar todas.
+        # Se conserva una copia ordenada en Python para no releerla desde Tk
+        self._valores_filtro = ["Todas", *self.gestor.categorias]
         
-        self.combo_categoria = ttk.Combobox(marco_filtro, values=categorias, state="readonly")
+        self.combo_categoria = ttk.Combobox(marco_filtro, values=self._valores_filtro, state="readonly")
         self.combo_categoria.current(0)  # Seleccionar "Todas" por defecto
         self.combo_categoria.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        self.combo_categoria.bind("<<ComboboxSelected>>", self.filtrar_por_categoria)
+        self.combo_categoria.bind("<<ComboboxSelected>>", self._programar_filtro)
         
         # Crear tooltip para el combobox de categorías
         Tooltip(self.combo_categoria, "Filtrar las cotizaciones disponibles por categoría")
@@ -345,24 +437,24 @@ class CotizadorApp:
         ttk.Frame(marco_botones, height=50).pack()
         
         # Botón para agregar a la cotización
-        self.btn_agregar = ttk.Button(
+        btn_agregar = ttk.Button(
             marco_botones, 
             text="→", 
             style='Action.TButton',
             command=self.agregar_a_seleccionadas
         )
-        self.btn_agregar.pack(pady=5)
-        Tooltip(self.btn_agregar, "Agregar el ítem seleccionado a la cotización actual")
+        btn_agregar.pack(pady=5)
+        Tooltip(btn_agregar, "Agregar el ítem seleccionado a la cotización actual")
         
         # Botón para quitar de la cotización
-        self.btn_quitar = ttk.Button(
+        btn_quitar = ttk.Button(
             marco_botones, 
             text="←", 
             style='Action.TButton',
             command=self.quitar_de_seleccionadas
         )
-        self.btn_quitar.pack(pady=5)
-        Tooltip(self.btn_quitar, "Quitar el ítem seleccionado de la cotización actual")
+        btn_quitar.pack(pady=5)
+        Tooltip(btn_quitar, "Quitar el ítem seleccionado de la cotización actual")
         
         # ----- COLUMNA DERECHA: SELECCIONADAS -----
         marco_seleccionadas = ttk.LabelFrame(marco_columnas, text="Cotización Actual", padding=10)
@@ -440,14 +532,14 @@ class CotizadorApp:
         marco_acciones.pack(fill=tk.X, pady=10)
         
         # Botón para generar Excel
-        btn_guardar = ttk.Button(
+        self.btn_guardar = ttk.Button(
             marco_acciones, 
             text="Guardar Cotización", 
             style="Accent.TButton",
             command=self.guardar_cotizacion
         )
-        btn_guardar.pack(side=tk.RIGHT, padx=5)
-        Tooltip(btn_guardar, "Exportar la cotización actual a un archivo Excel")
+        self.btn_guardar.pack(side=tk.RIGHT, padx=5)
+        Tooltip(self.btn_guardar, "Exportar la cotización actual a un archivo Excel")
         
         # Botón para nueva cotización
         btn_nueva = ttk.Button(
@@ -467,34 +559,142 @@ class CotizadorApp:
         )
         self.barra_estado.pack(side=tk.BOTTOM, fill=tk.X)
     
+    @contextmanager
+    def _actualizacion_por_lotes(self, arbol):
+        """
+        Agrupa varias modificaciones de un Treeview en un único repintado.
+        
+        Oculta temporalmente las columnas visibles mientras se insertan,
+        mueven o eliminan filas, y las restaura al salir, de modo que Tk
+        recalcula el diseño una sola vez en lugar de hacerlo por cada fila.
+        
+        Args:
+            arbol: Treeview cuyas modificaciones se agruparán
+        """
+        columnas_visibles = arbol['displaycolumns']
+        arbol.configure(displaycolumns=())
+        try:
+            yield arbol
+        finally:
+            arbol.configure(displaycolumns=columnas_visibles)
+    
+    def _sincronizar_arbol(self, arbol, filas, items, obtener_valores, conservar=()):
+        """
+        Sincroniza un Treeview con una lista de ítems emitiendo solo los cambios.
+        
+        En lugar de borrar y volver a insertar todas las filas, compara la lista
+        nueva con las filas ya presentes: elimina u oculta las que sobran, inserta
+        las que faltan y solo reconfigura valores o colores alternos cuando cambiaron.
+        
+        Las filas de ítems incluidos en `conservar` no se eliminan: se separan del
+        árbol con detach() y se vuelven a mostrar con move() cuando corresponda,
+        de modo que cambiar el filtro no crea ni destruye filas.
+        
+        Args:
+            arbol: Treeview a sincronizar
+            filas: Diccionario {item: [iid, valores, tags, visible]} con las filas actuales
+            items: Lista de tuplas (nombre, precio, categoria) a mostrar, en orden
+            obtener_valores: Función que recibe un ítem y devuelve los valores de la fila
+            conservar: Conjunto de ítems cuyas filas se ocultan en lugar de eliminarse
+        """
+        nuevos = set(items)
+        
+        # Separar las filas que sobran en las que se ocultan y las que se eliminan
+        ocultas = []
+        sobrantes = []
+        for item, fila in filas.items():
+            if item in nuevos:
+                continue
+            if item in conservar:
+                if fila[3]:
+                    ocultas.append(fila[0])
+                    fila[3] = False
+            else:
+                sobrantes.append(item)
+        
+        # Ocultar en una sola llamada las filas que se podrán reutilizar
+        if ocultas:
+            arbol.detach(*ocultas)
+            arbol.selection_remove(*ocultas)
+        
+        # Eliminar en una sola llamada las filas que ya no deben mostrarse
+        if sobrantes:
+            iids_sobrantes = [filas.pop(item)[0] for item in sobrantes]
+            arbol.delete(*iids_sobrantes)
+        
+        # Orden actual de las filas visibles, para mover solo las que cambiaron de lugar
+        orden = list(arbol.get_children()) if filas else []
+        
+        # Métodos usados en cada fila, resueltos una sola vez fuera del bucle
+        insertar = arbol.insert
+        mover = arbol.move
+        configurar_fila = arbol.item
+        obtener_fila = filas.get
+        obtener_id = self.gestor.obtener_id
+        tags_alternos = self.TAGS_ALTERNOS
+        
+        # Ubicar, insertar o actualizar las filas restantes
+        for indice, item in enumerate(items):
+            valores = obtener_valores(item)
+            tags = tags_alternos[indice & 1]  # Alternar colores
+            fila = obtener_fila(item)
+            
+            if fila is None:
+                iid = insertar('', indice, iid=str(obtener_id(item)), values=valores, tags=tags)
+                filas[item] = [iid, valores, tags, True]
+                orden.insert(indice, iid)
+                continue
+            
+            iid = fila[0]
+            if not fila[3]:
+                # Volver a mostrar una fila oculta en su posición
+                mover(iid, '', indice)
+                orden.insert(indice, iid)
+                fila[3] = True
+            elif orden[indice] != iid:
+                mover(iid, '', indice)
+                orden.remove(iid)
+                orden.insert(indice, iid)
+            if fila[1] != valores:
+                configurar_fila(iid, values=valores)
+                fila[1] = valores
+            if fila[2] is not tags:
+                configurar_fila(iid, tags=tags)
+                fila[2] = tags
+    
     def actualizar_lista_disponibles(self):
         """Actualiza la lista de cotizaciones disponibles en la interfaz."""
-        # Limpiar lista actual
-        for item in self.tree_disponibles.get_children():
-            self.tree_disponibles.delete(item)
-        
-        # Insertar ítems actualizados
-        for i, (nombre, precio, categoria) in enumerate(self.gestor.cotizaciones_disponibles):
-            precio_formateado = f"{precio:.2f}"
-            tag = 'even' if i % 2 == 0 else 'odd'  # Alternar colores
-            self.tree_disponibles.insert('', tk.END, values=(nombre, precio_formateado, categoria), tags=(tag,))
+        formatear_precio = self.gestor.obtener_precio_formateado
+        
+        with self._actualizacion_por_lotes(self.tree_disponibles):
+            self._sincronizar_arbol(
+                self.tree_disponibles,
+                self._iids_disponibles,
+                self.gestor.cotizaciones_disponibles,
+                lambda item: (item[0], formatear_precio(item), item[2]),
+                conservar=self.gestor.items_base
+            )
             
         # Mostrar mensaje en la barra de estado
         self.status_message.set(f"Cotizaciones disponibles: {len(self.gestor.cotizaciones_disponibles)}")
     
     def actualizar_lista_seleccionadas(self):
         """Actualiza la lista de cotizaciones seleccionadas y recalcula el total."""
-        # Limpiar lista actual
-        for item in self.tree_seleccionadas.get_children():
-            self.tree_seleccionadas.delete(item)
-        
-        # Insertar ítems actualizados
-        for i, (nombre, precio, categoria) in enumerate(self.gestor.cotizaciones_seleccionadas):
-            precio_formateado = f"{precio:.2f}"
-            item = (nombre, precio, categoria)
-            comentario = self.gestor.obtener_comentario(item) if hasattr(self.gestor, 'obtener_comentario') else ""
-            tag = 'even' if i % 2 == 0 else 'odd'  # Alternar colores
-            self.tree_seleccionadas.insert('', tk.END, values=(nombre, precio_formateado, categoria, comentario), tags=(tag,))
+        # Resolver una sola vez los métodos usados por cada fila
+        obtener_comentario = self.gestor.obtener_comentario
+        formatear_precio = self.gestor.obtener_precio_formateado
+        
+        def obtener_valores(item):
+            nombre, _, categoria = item
+            return (nombre, formatear_precio(item), categoria, obtener_comentario(item))
+        
+        with self._actualizacion_por_lotes(self.tree_seleccionadas):
+            self._sincronizar_arbol(
+                self.tree_seleccionadas,
+                self._iids_seleccionadas,
+                self.gestor.cotizaciones_seleccionadas,
+                obtener_valores
+            )
         
         # Actualizar el total
         total = self.gestor.calcular_total()
@@ -503,22 +703,75 @@ class CotizadorApp:
         # Mostrar mensaje en la barra de estado
         self.status_message.set(f"Ítems en la cotización actual: {len(self.gestor.cotizaciones_seleccionadas)}")
     
-    def filtrar_por_categoria(self, event=None):
+    def _programar_refresco(self, *listas):
+        """
+        Programa el refresco de una o varias listas para el próximo ciclo de
+        inactividad de Tk. Varias peticiones antes de ese momento se combinan
+        en una sola actualización por lista.
+        
+        Args:
+            listas: Nombres de las listas a refrescar: 'disponibles' y/o 'seleccionadas'
+        """
+        if not self._refrescos_pendientes:
+            self.root.after_idle(self._aplicar_refrescos)
+        self._refrescos_pendientes.update(listas)
+    
+    def _aplicar_refrescos(self):
+        """Ejecuta los refrescos programados por _programar_refresco."""
+        pendientes = self._refrescos_pendientes
+        self._refrescos_pendientes = set()
+        
+        # Conservar el mensaje de la acción que pidió el refresco
+        mensaje = self.status_message.get()
+        if 'disponibles' in pendientes:
+            self.actualizar_lista_disponibles()
+        if 'seleccionadas' in pendientes:
+            self.actualizar_lista_seleccionadas()
+        self.status_message.set(mensaje)
+    
+    def _programar_filtro(self, event=None):
+        """
+        Programa el filtrado por categoría tras una breve espera.
+        
+        Si el usuario recorre varias categorías seguidas (por ejemplo con las
+        flechas del teclado), solo se aplica la última selección.
+        
+        Args:
+            event: Evento del combobox (no usado directamente)
+        """
+        if self._filtro_after_id is not None:
+            self.root.after_cancel(self._filtro_after_id)
+        self._filtro_after_id = self.root.after(self.RETARDO_FILTRO_MS, self._aplicar_filtro_programado)
+    
+    def _aplicar_filtro_programado(self):
+        """Aplica el filtrado programado por _programar_filtro."""
+        self._filtro_after_id = None
+        
+        # Volver a elegir la categoría ya aplicada no cambia la lista
+        categoria = self.combo_categoria.get()
+        if categoria == self._categoria_filtrada:
+            return
+        self.filtrar_por_categoria(categoria=categoria)
+    
+    def filtrar_por_categoria(self, event=None, categoria=None):
         """
         Filtra las cotizaciones disponibles por categoría.
         
         Args:
             event: Evento del combobox (no usado directamente)
+            categoria: Categoría ya leída del combobox; si es None se lee de él
         """
-        categoria_seleccionada = self.combo_categoria.get()
+        categoria_seleccionada = self.combo_categoria.get() if categoria is None else categoria
+        self._categoria_filtrada = categoria_seleccionada
         self.gestor.filtrar_disponibles_por_categoria(categoria_seleccionada)
         self.actualizar_lista_disponibles()
         
         # Actualizar mensaje de estado
+        cantidad = len(self.gestor.cotizaciones_disponibles)
         if categoria_seleccionada == "Todas":
-            self.status_message.set(f"Mostrando todas las cotizaciones disponibles ({len(self.gestor.cotizaciones_disponibles)})")
+            self.status_message.set(f"Mostrando todas las cotizaciones disponibles ({cantidad})")
         else:
-            self.status_message.set(f"Filtrando por categoría: {categoria_seleccionada} ({len(self.gestor.cotizaciones_disponibles)} resultados)")
+            self.status_message.set(f"Filtrando por categoría: {categoria_seleccionada} ({cantidad} resultados)")
     
     def agregar_a_seleccionadas(self, event=None):
         """Agrega el ítem seleccionado a la lista de cotizaciones seleccionadas."""
@@ -527,18 +780,11 @@ class CotizadorApp:
             messagebox.showinfo("Información", "Por favor, seleccione un ítem para agregar.")
             return
         
-        # Obtener el ítem seleccionado
-        item_id = seleccion[0]
-        valores = self.tree_disponibles.item(item_id, 'values')
-        
-        # Convertir los valores al formato adecuado
-        nombre = valores[0]
-        # Eliminar posibles caracteres no numéricos (como $) y convertir a float
-        precio = float(valores[1].replace('$', '').replace(',', ''))
-        categoria = valores[2]
+        # Obtener la tupla original del ítem seleccionado
+        item = self.gestor.obtener_cotizacion(int(seleccion[0]))
+        nombre = item[0]
         
         # Añadir a seleccionadas y quitar de disponibles usando el gestor
-        item = (nombre, precio, categoria)
         self.gestor.agregar_a_seleccionadas(item)
         
         # Actualizar las listas
@@ -556,17 +802,9 @@ class CotizadorApp:
             messagebox.showinfo("Información", "Por favor, seleccione una cotización para eliminar.")
             return
         
-        # Obtener datos del ítem seleccionado
-        item_id = seleccion[0]
-        valores = self.tree_disponibles.item(item_id, 'values')
-        
-        # Convertir los valores al formato adecuado
-        nombre = valores[0]
-        precio = float(valores[1].replace('$', '').replace(',', ''))
-        categoria = valores[2]
-        
-        # Crear la tupla que representa al ítem
-        item = (nombre, precio, categoria)
+        # Obtener la tupla original del ítem seleccionado
+        item = self.gestor.obtener_cotizacion(int(seleccion[0]))
+        nombre = item[0]
         
         # Pedir confirmación antes de eliminar
         if messagebox.askyesno("Confirmar eliminación", 
@@ -592,17 +830,11 @@ class CotizadorApp:
             messagebox.showinfo("Información", "Por favor, seleccione un ítem para quitar.")
             return
         
-        # Obtener el ítem seleccionado
-        item_id = seleccion[0]
-        valores = self.tree_seleccionadas.item(item_id, 'values')
-        
-        # Convertir los valores al formato adecuado
-        nombre = valores[0]
-        precio = float(valores[1].replace('$', '').replace(',', ''))
-        categoria = valores[2]
+        # Obtener la tupla original del ítem seleccionado
+        item = self.gestor.obtener_cotizacion(int(seleccion[0]))
+        nombre = item[0]
         
         # Quitar de seleccionadas y añadir a disponibles usando el gestor
-        item = (nombre, precio, categoria)
         self.gestor.quitar_de_seleccionadas(item)
         
         # Actualizar las listas
@@ -621,6 +853,7 @@ class CotizadorApp:
                 
                 # Resetear el filtro
                 self.combo_categoria.current(0)
+                self._categoria_filtrada = "Todas"
                 
                 # Actualizar las listas
                 self.actualizar_lista_disponibles()
@@ -639,20 +872,42 @@ class CotizadorApp:
             self.status_message.set("No hay ítems para guardar")
             return
         
-        # Verificar si openpyxl está disponible
-        if not OPENPYXL_DISPONIBLE:
-            messagebox.showerror(
-                "Error: Módulo no encontrado", 
-                "El módulo 'openpyxl' no está instalado.\n\n" +
-                "Por favor, instale el módulo usando:\n" +
-                "pip install openpyxl\n\n" +
-                "Y luego reinicie la aplicación."
-            )
-            self.status_message.set("Error: módulo openpyxl no disponible")
-            return
+        # Exportar a Excel en segundo plano para no bloquear la interfaz.
+        # El botón se deshabilita hasta que termine para evitar guardados dobles.
+        # El hilo de trabajo recibe una copia de la selección y su total: el
+        # usuario puede seguir agregando o quitando ítems durante la exportación.
+        self.btn_guardar.state(['disabled'])
+        self.status_message.set("Guardando cotización…")
+        futuro = self._ejecutor_io.submit(
+            self.gestor.exportar_a_excel,
+            list(self.gestor.cotizaciones_seleccionadas),
+            self.gestor.calcular_total()
+        )
+        self._sondear_exportacion(futuro)
+    
+    def _sondear_exportacion(self, futuro):
+        """
+        Comprueba desde el hilo de Tk si terminó la exportación a Excel y, si
+        no, vuelve a comprobarlo más tarde. El hilo de trabajo no llama a Tk,
+        que solo admite llamadas desde su propio hilo.
+        
+        Args:
+            futuro: Future de la llamada a GestorCotizaciones.exportar_a_excel
+        """
+        if futuro.done():
+            self._sondeo_exportacion_id = None
+            self._mostrar_resultado_exportacion(futuro.result())
+        else:
+            self._sondeo_exportacion_id = self.root.after(50, self._sondear_exportacion, futuro)
+    
+    def _mostrar_resultado_exportacion(self, resultado):
+        """
+        Informa al usuario el resultado de la exportación a Excel.
         
-        # Exportar a Excel usando el gestor
-        resultado = self.gestor.exportar_a_excel()
+        Args:
+            resultado: Diccionario devuelto por GestorCotizaciones.exportar_a_excel
+        """
+        self.btn_guardar.state(['!disabled'])
         
         if resultado["exito"]:
             messagebox.showinfo(
@@ -667,21 +922,55 @@ class CotizadorApp:
             )
             self.status_message.set("Error al guardar la cotización")
     
+    def _centrar_dialogo(self, dialog, ancho, alto):
+        """
+        Da tamaño a un diálogo y lo centra sobre la ventana principal con una
+        sola llamada a geometry(), a partir de su tamaño conocido y sin forzar
+        un ciclo de idle para medirlo.
+        
+        Args:
+            dialog: Toplevel a posicionar
+            ancho: Ancho del diálogo en píxeles
+            alto: Alto del diálogo en píxeles
+        """
+        x = self.root.winfo_x() + (self.root.winfo_width() - ancho) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - alto) // 2
+        dialog.geometry(f"{ancho}x{alto}+{x}+{y}")
+    
+    @staticmethod
+    def _es_precio_parcial(texto):
+        """
+        Indica si el texto del campo de precio puede ser un precio a medio escribir.
+        Se usa como validatecommand del campo, que lo llama en cada pulsación.
+        
+        Args:
+            texto: Contenido que tendría el campo tras la edición (%P)
+            
+        Returns:
+            bool: True si el texto es vacío o solo dígitos con un separador decimal
+        """
+        return _PATRON_PRECIO.fullmatch(texto) is not None
+    
     def mostrar_dialog_nueva_cotizacion(self):
         """Muestra un diálogo para añadir una nueva cotización."""
-        # Crear ventana emergente
+        # El diálogo se construye la primera vez y se reutiliza en las siguientes
+        if self._abrir_dialog_nueva is None:
+            self._abrir_dialog_nueva = self._crear_dialog_nueva_cotizacion()
+        self._abrir_dialog_nueva()
+    
+    def _crear_dialog_nueva_cotizacion(self):
+        """
+        Construye (oculto) el diálogo para añadir una nueva cotización.
+        
+        Returns:
+            function: Función sin argumentos que limpia los campos y muestra el diálogo
+        """
+        # Crear ventana emergente, oculta hasta que se abra
         dialog = tk.Toplevel(self.root)
+        dialog.withdraw()
         dialog.title("Añadir Nueva Cotización")
-        dialog.geometry("450x400")
         dialog.resizable(False, False)
         dialog.transient(self.root)  # Hace que la ventana sea modal
-        dialog.grab_set()  # Bloquea la ventana principal hasta que esta se cierre
-        
-        # Centrar la ventana en la pantalla
-        dialog.update_idletasks()
-        x = self.root.winfo_x() + (self.root.winfo_width() // 2) - (dialog.winfo_width() // 2)
-        y = self.root.winfo_y() + (self.root.winfo_height() // 2) - (dialog.winfo_height() // 2)
-        dialog.geometry(f"+{x}+{y}")
         
         # Marco del formulario con padding
         marco_form = ttk.Frame(dialog, padding=20)
@@ -691,23 +980,21 @@ class CotizadorApp:
         titulo_form = ttk.Label(marco_form, text="Añadir Nueva Cotización", style="Header.TLabel")
         titulo_form.grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 15))
         
-        # Obtener categorías existentes para el combobox
-        categorias_existentes = self.gestor.obtener_categorias_unicas()
-        
         # Campo: Descripción
         ttk.Label(marco_form, text="Descripción:").grid(row=1, column=0, sticky=tk.W, pady=(0, 10))
         entrada_descripcion = ttk.Entry(marco_form, width=40)
         entrada_descripcion.grid(row=1, column=1, sticky=tk.W, pady=(0, 10))
-        entrada_descripcion.focus_set()  # Poner el foco inicial aquí
         
         # Campo: Precio
         ttk.Label(marco_form, text="Precio (CRC):").grid(row=2, column=0, sticky=tk.W, pady=(0, 10))
-        entrada_precio = ttk.Entry(marco_form, width=15)
+        # Rechazar desde el teclado cualquier carácter que no forme un número
+        validar_precio = (dialog.register(self._es_precio_parcial), '%P')
+        entrada_precio = ttk.Entry(marco_form, width=15, validate='key', validatecommand=validar_precio)
         entrada_precio.grid(row=2, column=1, sticky=tk.W, pady=(0, 10))
         
         # Campo: Categoría (combobox con opción de entrada)
         ttk.Label(marco_form, text="Categoría:").grid(row=3, column=0, sticky=tk.W, pady=(0, 10))
-        combo_categoria = ttk.Combobox(marco_form, values=categorias_existentes, width=38)
+        combo_categoria = ttk.Combobox(marco_form, width=38)
         combo_categoria.grid(row=3, column=1, sticky=tk.W, pady=(0, 10))
         
         # Campo: Comentario
@@ -720,7 +1007,9 @@ class CotizadorApp:
         ttk.Label(marco_form, text=info_text, font=('Arial', 8), foreground='gray').grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=(5, 10))
         
         # Mensaje de error (inicialmente oculto)
-        lbl_error = ttk.Label(marco_form, text="", foreground='red')
+        # El texto se actualiza a través de una StringVar en lugar de reconfigurar la etiqueta
+        mensaje_error = tk.StringVar(dialog)
+        lbl_error = ttk.Label(marco_form, textvariable=mensaje_error, foreground='red')
         lbl_error.grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=(5, 10))
         
         # Separador antes de los botones
@@ -731,6 +1020,39 @@ class CotizadorApp:
         marco_botones = ttk.Frame(marco_form)
         marco_botones.grid(row=8, column=0, columnspan=2, sticky=tk.E, pady=(10, 0))
         
+        # Tupla de categorías cargada en el combobox en la última apertura
+        categorias_mostradas = None
+        
+        def abrir():
+            """Limpia los campos y muestra el diálogo."""
+            nonlocal categorias_mostradas
+            
+            # Restablecer los campos del uso anterior
+            entrada_descripcion.delete(0, tk.END)
+            entrada_precio.delete(0, tk.END)
+            combo_categoria.set("")
+            
+            # El gestor devuelve la misma tupla mientras las categorías no cambien:
+            # solo se envían de nuevo a Tk cuando hay una tupla nueva
+            categorias = self.gestor.categorias
+            if categorias is not categorias_mostradas:
+                combo_categoria['values'] = categorias
+                categorias_mostradas = categorias
+            texto_comentario.delete('1.0', tk.END)
+            mensaje_error.set("")
+            
+            # Centrar la ventana sobre la principal
+            self._centrar_dialogo(dialog, 450, 400)
+            
+            dialog.deiconify()
+            dialog.grab_set()  # Bloquea la ventana principal hasta que esta se cierre
+            entrada_descripcion.focus_set()  # Poner el foco inicial aquí
+        
+        def cerrar():
+            """Oculta el diálogo para reutilizarlo en la próxima apertura."""
+            dialog.grab_release()
+            dialog.withdraw()
+        
         def validar_y_guardar():
             """Valida los campos y guarda la nueva cotización si son válidos."""
             # Obtener valores ingresados
@@ -741,72 +1063,89 @@ class CotizadorApp:
             
             # Validar campos
             if not descripcion:
-                lbl_error.config(text="Error: La descripción no puede estar vacía.")
+                mensaje_error.set("Error: La descripción no puede estar vacía.")
                 entrada_descripcion.focus_set()
                 return
                 
             if not precio_str:
-                lbl_error.config(text="Error: El precio no puede estar vacío.")
+                mensaje_error.set("Error: El precio no puede estar vacío.")
                 entrada_precio.focus_set()
                 return
                 
             if not categoria:
-                lbl_error.config(text="Error: La categoría no puede estar vacía.")
+                mensaje_error.set("Error: La categoría no puede estar vacía.")
                 combo_categoria.focus_set()
                 return
             
             # Validar que el precio sea un número positivo
             try:
-                precio = float(precio_str.replace(',', '.'))  # Permitir comas como separador decimal
+                # Permitir comas como separador decimal, sin copiar el texto si no las hay
+                if ',' in precio_str:
+                    precio_str = precio_str.replace(',', '.')
+                precio = float(precio_str)
                 if precio <= 0:
-                    lbl_error.config(text="Error: El precio debe ser un número positivo.")
+                    mensaje_error.set("Error: El precio debe ser un número positivo.")
                     entrada_precio.focus_set()
                     return
             except ValueError:
-                lbl_error.config(text="Error: El precio debe ser un número válido.")
+                mensaje_error.set("Error: El precio debe ser un número válido.")
                 entrada_precio.focus_set()
                 return
             
-            # Si pasó todas las validaciones, agregar la cotización usando el gestor
-            item = self.gestor.agregar_nueva_cotizacion_base(descripcion, precio, categoria)
+            # La base no admite dos cotizaciones idénticas
+            if self.gestor.obtener_id((descripcion, precio, categoria)) is not None:
+                mensaje_error.set("Error: Ya existe una cotización con esa descripción, precio y categoría.")
+                entrada_descripcion.focus_set()
+                return
             
-            # Si hay comentario, establecerlo
-            if comentario:
-                self.gestor.establecer_comentario(item, comentario)
+            # Si pasó todas las validaciones, agregar la cotización usando el gestor.
+            # El alta y el comentario se guardan juntos en una sola escritura del JSON.
+            with self.gestor.lote():
+                item = self.gestor.agregar_nueva_cotizacion_base(descripcion, precio, categoria)
+                
+                # Si hay comentario, establecerlo
+                if comentario:
+                    self.gestor.establecer_comentario(item, comentario)
             
-            # Actualizar el combobox de categorías si es una categoría nueva
-            if categoria not in self.combo_categoria['values']:
-                categorias = list(self.combo_categoria['values'])
-                if "Todas" in categorias:
-                    categorias.remove("Todas")
-                categorias.append(categoria)
-                categorias.sort()
-                categorias.insert(0, "Todas")
-                self.combo_categoria['values'] = categorias
+            # Actualizar el combobox de categorías si es una categoría nueva,
+            # insertándola en su posición ordenada sin reordenar toda la lista
+            valores_filtro = self._valores_filtro
+            posicion = bisect.bisect_left(valores_filtro, categoria, lo=1)  # Omitir "Todas" en la posición 0
+            if posicion == len(valores_filtro) or valores_filtro[posicion] != categoria:
+                valores_filtro.insert(posicion, categoria)
+                self.combo_categoria['values'] = valores_filtro
             
-            # Actualizar la interfaz
-            self.filtrar_por_categoria()  # Para mantener el filtro actual
+            # Actualizar la interfaz. El gestor agrega la cotización al final de
+            # las disponibles; si el filtro actual la incluye, la lista ya está
+            # en el orden filtrado y basta con sincronizar la nueva fila.
+            if self._categoria_filtrada in ("Todas", categoria):
+                self.actualizar_lista_disponibles()
+            else:
+                self.filtrar_por_categoria()  # Para mantener el filtro actual
             
             # Mensaje de estado
             self.status_message.set(f"Cotización '{descripcion}' añadida correctamente")
             
             # Cerrar el diálogo
-            dialog.destroy()
+            cerrar()
             
             # Mostrar mensaje de confirmación
             messagebox.showinfo("Éxito", f"Cotización '{descripcion}' añadida correctamente.")
         
         # Botón: Cancelar
-        btn_cancelar = ttk.Button(marco_botones, text="Cancelar", command=dialog.destroy)
+        btn_cancelar = ttk.Button(marco_botones, text="Cancelar", command=cerrar)
         btn_cancelar.pack(side=tk.RIGHT, padx=(5, 0))
         
         # Botón: Aceptar
         btn_aceptar = ttk.Button(marco_botones, text="Aceptar", style="Accent.TButton", command=validar_y_guardar)
         btn_aceptar.pack(side=tk.RIGHT)
         
-        # Configurar comportamiento de teclas
+        # Configurar comportamiento de teclas y del botón de cierre de la ventana
         dialog.bind("<Return>", lambda event: validar_y_guardar())
-        dialog.bind("<Escape>", lambda event: dialog.destroy())
+        dialog.bind("<Escape>", lambda event: cerrar())
+        dialog.protocol("WM_DELETE_WINDOW", cerrar)
+        
+        return abrir
     
     def editar_comentario_disponible(self, event=None):
         """
@@ -820,20 +1159,10 @@ class CotizadorApp:
         if not seleccion:
             return  # No hacer nada si no hay selección
         
-        # Obtener datos del ítem seleccionado
-        item_id = seleccion[0]
-        valores = self.tree_disponibles.item(item_id, 'values')
-        
-        # Convertir los valores al formato adecuado
-        nombre = valores[0]
-        precio = float(valores[1].replace(',', ''))
-        categoria = valores[2]
-        
-        # Crear la tupla que representa al ítem
-        item = (nombre, precio, categoria)
-        
-        # Obtener el comentario actual
-        comentario_actual = self.gestor.obtener_comentario(item)
+        # Obtener la tupla original del ítem seleccionado y su comentario actual
+        id_cotizacion = int(seleccion[0])
+        item = self.gestor.obtener_cotizacion(id_cotizacion)
+        comentario_actual = self.gestor.obtener_comentario_por_id(id_cotizacion)
         
         # Mostrar el diálogo para editar comentario
         self.mostrar_dialog_comentario(item, comentario_actual)
@@ -850,20 +1179,10 @@ class CotizadorApp:
         if not seleccion:
             return  # No hacer nada si no hay selección
         
-        # Obtener datos del ítem seleccionado
-        item_id = seleccion[0]
-        valores = self.tree_seleccionadas.item(item_id, 'values')
-        
-        # Convertir los valores al formato adecuado
-        nombre = valores[0]
-        precio = float(valores[1].replace(',', ''))
-        categoria = valores[2]
-        
-        # Crear la tupla que representa al ítem
-        item = (nombre, precio, categoria)
-        
-        # Obtener el comentario actual
-        comentario_actual = self.gestor.obtener_comentario(item)
+        # Obtener la tupla original del ítem seleccionado y su comentario actual
+        id_cotizacion = int(seleccion[0])
+        item = self.gestor.obtener_cotizacion(id_cotizacion)
+        comentario_actual = self.gestor.obtener_comentario_por_id(id_cotizacion)
         
         # Mostrar el diálogo para editar comentario
         self.mostrar_dialog_comentario(item, comentario_actual)
@@ -876,21 +1195,28 @@ class CotizadorApp:
             item: Tupla (nombre, precio, categoria) de la cotización
             comentario_actual: Comentario actual de la cotización
         """
-        nombre, precio, categoria = item
+        # El diálogo se construye la primera vez y se reutiliza en las siguientes
+        if self._abrir_dialog_comentario is None:
+            self._abrir_dialog_comentario = self._crear_dialog_comentario()
+        self._abrir_dialog_comentario(item, comentario_actual)
+    
+    def _crear_dialog_comentario(self):
+        """
+        Construye (oculto) el diálogo para editar el comentario de una cotización.
         
-        # Crear ventana emergente
+        Returns:
+            function: Función que recibe (item, comentario_actual), carga los
+                      datos de la cotización y muestra el diálogo
+        """
+        # Cotización cuyo comentario se está editando y su comentario al abrir
+        item_actual = None
+        comentario_original = ""
+        
+        # Crear ventana emergente, oculta hasta que se abra
         dialog = tk.Toplevel(self.root)
-        dialog.title(f"Comentario para: {nombre}")
-        dialog.geometry("450x350")
+        dialog.withdraw()
         dialog.resizable(True, True)
         dialog.transient(self.root)  # Hace que la ventana sea modal
-        dialog.grab_set()  # Bloquea la ventana principal hasta que esta se cierre
-        
-        # Centrar la ventana en la pantalla
-        dialog.update_idletasks()
-        x = self.root.winfo_x() + (self.root.winfo_width() // 2) - (dialog.winfo_width() // 2)
-        y = self.root.winfo_y() + (self.root.winfo_height() // 2) - (dialog.winfo_height() // 2)
-        dialog.geometry(f"+{x}+{y}")
         
         # Marco del formulario
         marco_form = ttk.Frame(dialog, padding=20)
@@ -909,15 +1235,18 @@ class CotizadorApp:
         
         # Descripción
         ttk.Label(detalle_frame, text="Descripción:", font=('Arial', 10, 'bold')).grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
-        ttk.Label(detalle_frame, text=nombre).grid(row=0, column=1, sticky=tk.W)
+        lbl_nombre = ttk.Label(detalle_frame)
+        lbl_nombre.grid(row=0, column=1, sticky=tk.W)
         
         # Precio
         ttk.Label(detalle_frame, text="Precio:", font=('Arial', 10, 'bold')).grid(row=1, column=0, sticky=tk.W, padx=(0, 5))
-        ttk.Label(detalle_frame, text=f"{precio:.2f} CRC").grid(row=1, column=1, sticky=tk.W)
+        lbl_precio = ttk.Label(detalle_frame)
+        lbl_precio.grid(row=1, column=1, sticky=tk.W)
         
         # Categoría
         ttk.Label(detalle_frame, text="Categoría:", font=('Arial', 10, 'bold')).grid(row=2, column=0, sticky=tk.W, padx=(0, 5))
-        ttk.Label(detalle_frame, text=categoria).grid(row=2, column=1, sticky=tk.W)
+        lbl_categoria = ttk.Label(detalle_frame)
+        lbl_categoria.grid(row=2, column=1, sticky=tk.W)
         
         # Separador
         separador = ttk.Separator(marco_form, orient=tk.HORIZONTAL)
@@ -929,36 +1258,70 @@ class CotizadorApp:
         # Campo de texto para el comentario
         texto_comentario = tk.Text(marco_form, wrap=tk.WORD, width=45, height=8)
         texto_comentario.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
-        texto_comentario.insert('1.0', comentario_actual)
-        texto_comentario.focus_set()  # Poner el foco inicial aquí
         
         # Marco para los botones
         marco_botones = ttk.Frame(marco_form)
         marco_botones.pack(fill=tk.X)
         
+        def abrir(item, comentario_actual=""):
+            """Carga los datos de la cotización y muestra el diálogo."""
+            nonlocal item_actual, comentario_original
+            item_actual = item
+            comentario_original = comentario_actual
+            nombre, _, categoria = item
+            
+            # Mostrar los datos de la cotización actual
+            dialog.title(f"Comentario para: {nombre}")
+            lbl_nombre.config(text=nombre)
+            lbl_precio.config(text=f"{self.gestor.obtener_precio_formateado(item)} CRC")
+            lbl_categoria.config(text=categoria)
+            texto_comentario.delete('1.0', tk.END)
+            texto_comentario.insert('1.0', comentario_actual)
+            
+            # Centrar la ventana sobre la principal
+            self._centrar_dialogo(dialog, 450, 350)
+            
+            dialog.deiconify()
+            dialog.grab_set()  # Bloquea la ventana principal hasta que esta se cierre
+            texto_comentario.focus_set()  # Poner el foco inicial aquí
+        
+        def cerrar():
+            """Oculta el diálogo para reutilizarlo en la próxima apertura."""
+            dialog.grab_release()
+            dialog.withdraw()
+        
         def guardar_comentario():
             """Guarda el comentario y cierra el diálogo."""
             nuevo_comentario = texto_comentario.get('1.0', 'end-1c').strip()
-            self.gestor.establecer_comentario(item, nuevo_comentario)
             
-            # Actualizar la vista de las listas para mostrar el nuevo comentario
-            self.actualizar_lista_disponibles()
-            self.actualizar_lista_seleccionadas()
+            # Sin cambios no hace falta escribir el JSON ni refrescar las listas
+            if nuevo_comentario == comentario_original:
+                cerrar()
+                return
+            
+            self.gestor.establecer_comentario(item_actual, nuevo_comentario)
+            
+            # Mostrar el nuevo comentario; solo la lista de seleccionadas tiene
+            # columna de comentario, así que la de disponibles no cambia
+            self._programar_refresco('seleccionadas')
             
             # Actualizar mensaje de estado
-            self.status_message.set(f"Comentario actualizado para: {nombre}")
+            self.status_message.set(f"Comentario actualizado para: {item_actual[0]}")
             
             # Cerrar el diálogo
-            dialog.destroy()
+            cerrar()
         
         # Botón: Cancelar
-        btn_cancelar = ttk.Button(marco_botones, text="Cancelar", command=dialog.destroy)
+        btn_cancelar = ttk.Button(marco_botones, text="Cancelar", command=cerrar)
         btn_cancelar.pack(side=tk.RIGHT, padx=(5, 0))
         
         # Botón: Guardar
         btn_guardar = ttk.Button(marco_botones, text="Guardar", style="Accent.TButton", command=guardar_comentario)
         btn_guardar.pack(side=tk.RIGHT)
         
-        # Configurar comportamiento de teclas
-        dialog.bind("<Escape>", lambda event: dialog.destroy())
-        dialog.bind("<Control-Return>", lambda event: guardar_comentario())  # Ctrl+Enter para guardar
\ No newline at end of file
+        # Configurar comportamiento de teclas y del botón de cierre de la ventana
+        dialog.bind("<Escape>", lambda event: cerrar())
+        dialog.bind("<Control-Return>", lambda event: guardar_comentario())  # Ctrl+Enter para guardar
+        dialog.protocol("WM_DELETE_WINDOW", cerrar)
+        
+        return abrir
\ No newline at end of file
@@ -7,15 +7,249 @@ Incluye funcionalidad para persistir las cotizaciones en formato JSON.
 
 from datetime import datetime
 import os
+import sys
 import json
+import bisect
+import math
+import numbers
+import re
+import importlib.util
+import zipfile
+from xml.sax.saxutils import escape
+from functools import lru_cache
+from typing import NamedTuple
+from contextlib import contextmanager
 
-# Intenta importar openpyxl
-try:
+# openpyxl es un módulo pesado y la mayoría de las sesiones no exportan a Excel:
+# al iniciar solo se comprueba que esté instalado, y se importa en la primera
+# exportación (ver _cargar_openpyxl)
+OPENPYXL_DISPONIBLE = importlib.util.find_spec("openpyxl") is not None
+
+@lru_cache(maxsize=None)
+def _cargar_openpyxl():
+    """
+    Importa openpyxl y crea los estilos de la exportación a Excel.
+    Solo la primera llamada importa el módulo; las siguientes devuelven los mismos
+    objetos, compartidos por todas las celdas de todas las exportaciones.
+    
+    Returns:
+        tuple: (módulo openpyxl, clase WriteOnlyCell, fuente negrita,
+                borde fino, alineación centrada, alineación a la derecha)
+    """
     import openpyxl
     from openpyxl.styles import Font, Alignment, Border, Side
-    OPENPYXL_DISPONIBLE = True
+    from openpyxl.cell import WriteOnlyCell
+    
+    fuente_negrita = Font(bold=True, size=12)  # Encabezados y total
+    borde_fino = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    return (openpyxl, WriteOnlyCell, fuente_negrita, borde_fino,
+            Alignment(horizontal='center'), Alignment(horizontal='right'))
+
+# Intenta importar orjson, más rápido que json para leer y escribir el archivo
+try:
+    import orjson
+    ORJSON_DISPONIBLE = True
+except ImportError:
+    ORJSON_DISPONIBLE = False
+
+# Intenta importar ijson, para leer los archivos grandes por partes
+try:
+    import ijson
+    IJSON_DISPONIBLE = True
 except ImportError:
-    OPENPYXL_DISPONIBLE = False
+    IJSON_DISPONIBLE = False
+
+# Tamaño en bytes a partir del cual, si ijson está disponible, el archivo se recorre
+# cotización por cotización en lugar de convertirse entero a una lista en memoria.
+# Por debajo, leerlo de una vez con orjson/json es más rápido.
+_UMBRAL_LECTURA_POR_PARTES = 4 * 1024 * 1024
+
+# Tamaño del búfer de escritura del archivo JSON, que se escribe por partes
+_TAMANO_BUFFER_ESCRITURA = 64 * 1024
+
+# Cotizaciones que se codifican juntas en cada parte del archivo JSON: una
+# llamada por lote amortiza el costo fijo de cada llamada al codificador
+_COTIZACIONES_POR_LOTE_JSON = 1000
+
+# Conversión entre el contenido del archivo (bytes UTF-8) y los datos de Python.
+# Con orjson se usa su codificador nativo; si no, json de la biblioteca estándar.
+# Los errores de formato son json.JSONDecodeError en ambos casos.
+# El archivo se escribe compacto (sin sangría): lo lee el programa, no una
+# persona, y sin sangría json usa su codificador en C en lugar del de Python.
+if ORJSON_DISPONIBLE:
+    _cargar_json = orjson.loads
+    _volcar_json = orjson.dumps
+else:
+    _cargar_json = json.loads
+    
+    # Un único codificador para todas las escrituras: json.dumps con argumentos
+    # propios crea un JSONEncoder nuevo en cada llamada
+    _codificador_json = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    
+    def _volcar_json(datos):
+        return _codificador_json.encode(datos).encode('utf-8')
+
+# Exportaciones con más filas que este umbral escriben el XML del .xlsx directamente
+# (ver _exportar_xlsx_directo) en lugar de crear un objeto de openpyxl por celda.
+# Ese camino no necesita openpyxl, así que también se usa cuando no está instalado.
+UMBRAL_EXPORTACION_DIRECTA = 1000
+
+# Caracteres de control que XML 1.0 no admite (los mismos que rechaza openpyxl)
+_CARACTERES_ILEGALES_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Partes fijas del paquete .xlsx de la exportación directa. Los estilos reproducen
+# los de la exportación con openpyxl; los índices de cellXfs son, en orden:
+# 1 texto con borde, 2 encabezado (negrita, centrado), 3 precio (derecha, ' ##0.00'),
+# 4 etiqueta del total (negrita, derecha), 5 total (negrita, derecha, '#0.00')
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Cotización" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode=" ##0.00"/><numFmt numFmtId="165" formatCode="#0.00"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="12"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="6">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center"/></xf>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="1" xfId="0" applyNumberFormat="1" applyBorder="1" applyAlignment="1"><alignment horizontal="right"/></xf>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="right"/></xf>'
+    '<xf numFmtId="165" fontId="1" fillId="0" borderId="1" xfId="0" applyNumberFormat="1" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="right"/></xf>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_XLSX_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<cols><col min="1" max="1" width="40" customWidth="1"/>'
+    '<col min="2" max="2" width="15" customWidth="1"/>'
+    '<col min="3" max="3" width="25" customWidth="1"/></cols>'
+    '<sheetData>'
+    '<row r="1"><c r="A1" t="inlineStr" s="2"><is><t>Descripción</t></is></c>'
+    '<c r="B1" t="inlineStr" s="2"><is><t>Precio (CRC)</t></is></c>'
+    '<c r="C1" t="inlineStr" s="2"><is><t>Categoría</t></is></c></row>'
+)
+
+def _texto_xml(valor):
+    """
+    Convierte un valor en texto apto para una celda del XML de la hoja:
+    lo pasa a str, quita los caracteres de control no admitidos y escapa el resto.
+    
+    Args:
+        valor: Valor a escribir como texto
+        
+    Returns:
+        str: Texto escapado para XML
+    """
+    return escape(_CARACTERES_ILEGALES_XML.sub('', str(valor)))
+
+def _numero_xml(valor):
+    """
+    Convierte un número en el contenido de un elemento <v> de la hoja.
+    
+    Args:
+        valor: Número a escribir
+        
+    Returns:
+        str: Representación del número
+        
+    Raises:
+        ValueError: Si el valor no es un número real finito (NaN e infinito no
+            tienen representación en el formato)
+    """
+    if isinstance(valor, bool) or not isinstance(valor, numbers.Real) or not math.isfinite(valor):
+        raise ValueError(f"Valor numérico no válido para Excel: {valor!r}")
+    return repr(float(valor))
+
+def _exportar_xlsx_directo(ruta, cotizaciones, total):
+    """
+    Escribe la hoja de la cotización como un .xlsx armado directamente en XML,
+    sin pasar por el modelo de objetos de openpyxl. Produce las mismas columnas,
+    anchos y estilos que la exportación con openpyxl.
+    
+    Args:
+        ruta: Ruta del archivo .xlsx a crear
+        cotizaciones: Tuplas (nombre, precio, categoria) a exportar, una por fila
+        total: Valor de la fila del total
+        
+    Raises:
+        ValueError: Si un precio o el total no es un número finito
+    """
+    filas = "".join(
+        f'<row r="{fila}">'
+        f'<c r="A{fila}" t="inlineStr" s="1"><is><t xml:space="preserve">{_texto_xml(nombre)}</t></is></c>'
+        f'<c r="B{fila}" s="3"><v>{_numero_xml(precio)}</v></c>'
+        f'<c r="C{fila}" t="inlineStr" s="1"><is><t xml:space="preserve">{_texto_xml(categoria)}</t></is></c>'
+        f'</row>'
+        for fila, (nombre, precio, categoria) in enumerate(cotizaciones, start=2)
+    )
+    fila_total = len(cotizaciones) + 2
+    hoja = (
+        f'{_XLSX_INICIO_HOJA}{filas}'
+        f'<row r="{fila_total}">'
+        f'<c r="A{fila_total}" t="inlineStr" s="4"><is><t>TOTAL:</t></is></c>'
+        f'<c r="B{fila_total}" s="5"><v>{_numero_xml(total)}</v></c>'
+        f'<c r="C{fila_total}" s="1"/>'
+        f'</row></sheetData></worksheet>'
+    )
+    
+    # Compresión mínima: el XML es muy repetitivo y el nivel 1 ya lo reduce mucho
+    with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as paquete:
+        paquete.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        paquete.writestr('_rels/.rels', _XLSX_RELS)
+        paquete.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+        paquete.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        paquete.writestr('xl/styles.xml', _XLSX_STYLES)
+        paquete.writestr('xl/worksheets/sheet1.xml', hoja)
+
+class Cotizacion(NamedTuple):
+    """
+    Cotización del catálogo: tupla inmutable (nombre, precio, categoria).
+    Al ser una tupla, se compara, se desempaqueta y se usa como clave de
+    diccionario igual que una tupla simple con los mismos valores.
+    """
+    nombre: str
+    precio: float
+    categoria: str
 
 class GestorCotizaciones:
     """
@@ -23,28 +257,122 @@ class GestorCotizaciones:
     Proporciona métodos para agregar, quitar y filtrar cotizaciones,
     así como para exportarlas a Excel.
     También gestiona la persistencia de las cotizaciones en formato JSON.
+    
+    La base nunca contiene dos cotizaciones idénticas (mismo nombre, precio y
+    categoría): las repetidas se descartan al cargar y al agregar. Así cada
+    cotización de la base tiene un único identificador entero y la tupla
+    identifica sin ambigüedad a su fila en las listas y en la interfaz.
     """
     
     # Nombre del archivo para persistencia
     ARCHIVO_COTIZACIONES = "cotizaciones.json"
     
-    def __init__(self):
+    def __init__(self, cargar=True):
         """
         Inicializa el gestor de cotizaciones.
         Intenta cargar las cotizaciones desde el archivo JSON si existe,
         o inicializa listas vacías si no.
+        
+        Args:
+            cargar: Si es False, el gestor empieza vacío y el llamador carga el
+                archivo más tarde con cargar_cotizaciones_desde_json()
         """
         # Listas para manejar las cotizaciones
         self.cotizaciones_base = []
         self.cotizaciones_disponibles = []
         self.cotizaciones_seleccionadas = []
         
+        # Conjunto con los mismos ítems que cotizaciones_seleccionadas, para
+        # comprobar la pertenencia sin recorrer la lista
+        self._seleccionadas = set()
+        
+        # Suma de los precios seleccionados, actualizada en cada alta o baja
+        self._total = 0.0
+        
         # Diccionario para almacenar comentarios por cotización
-        # La clave es un identificador único (nombre, precio, categoria) y el valor es el comentario
+        # La clave es el identificador entero de la cotización (ver obtener_id) y el
+        # valor es el comentario; un entero se hashea sin recorrer nombre y categoría
         self.comentarios = {}
         
+        # Precios ya formateados para mostrar, calculados una sola vez por cotización
+        self._precios_formateados = {}
+        
+        # Categorías únicas ordenadas; None indica que deben recalcularse
+        self._categorias = None
+        
+        # Cotizaciones base agrupadas por categoría (en el orden de la base),
+        # para filtrar sin recorrer toda la base; None indica que deben recalcularse
+        self._cotizaciones_por_categoria = None
+        
+        # Escritura diferida del JSON: dentro de un bloque lote() los cambios solo
+        # se marcan como pendientes y se guardan una vez al cerrar el bloque
+        self._lotes_abiertos = 0
+        self._cambios_pendientes = False
+        
+        # Identificadores enteros estables de cada cotización de la base.
+        # cotizaciones_por_id relaciona id -> tupla y _ids la relación inversa;
+        # como la base no tiene cotizaciones repetidas, la relación es uno a uno.
+        self.cotizaciones_por_id = {}
+        self._ids = {}
+        self._siguiente_id = 0
+        
         # Cargar las cotizaciones desde el archivo JSON si existe
-        self.cargar_cotizaciones_desde_json()
+        if cargar:
+            self.cargar_cotizaciones_desde_json()
+    
+    def _reiniciar_estado(self):
+        """Vacía las listas, los comentarios y los índices derivados de la base."""
+        self.cotizaciones_base = []
+        self.cotizaciones_disponibles = []
+        self.cotizaciones_seleccionadas = []
+        self._seleccionadas = set()
+        self._total = 0.0
+        self.comentarios = {}
+        self._precios_formateados = {}
+        self._categorias = None
+        self._cotizaciones_por_categoria = None
+        self.cotizaciones_por_id = {}
+        self._ids = {}
+    
+    def _registrar_cotizacion(self, item):
+        """
+        Asigna un identificador entero estable a una cotización de la base.
+        
+        Args:
+            item: Tupla (nombre, precio, categoria) a registrar
+            
+        Returns:
+            int: Identificador asignado
+        """
+        id_cotizacion = self._siguiente_id
+        self._siguiente_id += 1
+        self._ids[item] = id_cotizacion
+        self.cotizaciones_por_id[id_cotizacion] = item
+        return id_cotizacion
+    
+    def obtener_id(self, item):
+        """
+        Obtiene el identificador entero de una cotización de la base.
+        
+        Args:
+            item: Tupla (nombre, precio, categoria) de la cotización
+            
+        Returns:
+            int: Identificador de la cotización, o None si no está en la base
+        """
+        return self._ids.get(item)
+    
+    def obtener_cotizacion(self, id_cotizacion):
+        """
+        Obtiene la cotización asociada a un identificador.
+        
+        Args:
+            id_cotizacion: Identificador entero devuelto por obtener_id
+            
+        Returns:
+            tuple: La cotización (nombre, precio, categoria), o None si no existe
+        """
+        return self.cotizaciones_por_id.get(id_cotizacion)
     
     def cargar_cotizaciones_desde_json(self):
         """
@@ -57,54 +385,65 @@ class GestorCotizaciones:
         try:
             # Verificar si el archivo existe
             if os.path.exists(self.ARCHIVO_COTIZACIONES):
-                with open(self.ARCHIVO_COTIZACIONES, 'r', encoding='utf-8') as archivo:
-                    # Cargar la lista de diccionarios desde el JSON
-                    cotizaciones_json = json.load(archivo)
+                with open(self.ARCHIVO_COTIZACIONES, 'rb') as archivo:
+                    if IJSON_DISPONIBLE and os.fstat(archivo.fileno()).st_size >= _UMBRAL_LECTURA_POR_PARTES:
+                        # Archivo grande: recorrer los diccionarios a medida que se leen,
+                        # sin construir antes la lista completa
+                        cotizaciones_json = ijson.items(archivo, 'item', use_float=True)
+                    else:
+                        # Cargar la lista de diccionarios desde el JSON en una sola lectura
+                        cotizaciones_json = _cargar_json(archivo.read())
                     
                     # Convertir de lista de diccionarios a lista de tuplas para uso interno
-                    self.cotizaciones_base = []
-                    self.comentarios = {}  # Reiniciar comentarios
+                    self._reiniciar_estado()
                     
+                    repetidas = 0
                     for cotizacion in cotizaciones_json:
-                        # Crear tupla de cotización
-                        item = (cotizacion["nombre"], cotizacion["precio"], cotizacion["categoria"])
+                        # Crear tupla de cotización. Las categorías se repiten en muchas
+                        # cotizaciones: internarlas deja un solo objeto por categoría y
+                        # las comparaciones entre ellas se resuelven por identidad
+                        item = Cotizacion(cotizacion["nombre"], cotizacion["precio"], sys.intern(cotizacion["categoria"]))
+                        comentario = cotizacion.get("comentario")
+                        
+                        # Una cotización repetida se une a la primera aparición,
+                        # conservando su comentario si aquella no tenía
+                        id_cotizacion = self._ids.get(item)
+                        if id_cotizacion is not None:
+                            repetidas += 1
+                            if comentario and not self.comentarios.get(id_cotizacion):
+                                self.comentarios[id_cotizacion] = comentario
+                            continue
+                        
                         self.cotizaciones_base.append(item)
+                        id_cotizacion = self._registrar_cotizacion(item)
                         
                         # Guardar comentario si existe
-                        if "comentario" in cotizacion and cotizacion["comentario"]:
-                            self.comentarios[item] = cotizacion["comentario"]
+                        if comentario:
+                            self.comentarios[id_cotizacion] = comentario
                     
-                    # Inicializar las listas de disponibles y seleccionadas
+                    # Inicializar la lista de disponibles
                     self.cotizaciones_disponibles = list(self.cotizaciones_base)
-                    self.cotizaciones_seleccionadas = []
                     
                     print(f"Cotizaciones cargadas desde {self.ARCHIVO_COTIZACIONES}: {len(self.cotizaciones_base)} items")
+                    if repetidas:
+                        print(f"Se descartaron {repetidas} cotizaciones repetidas")
                     return True
             else:
                 # Si el archivo no existe, inicializar con listas vacías
-                self.cotizaciones_base = []
-                self.cotizaciones_disponibles = []
-                self.cotizaciones_seleccionadas = []
-                self.comentarios = {}
+                self._reiniciar_estado()
                 print(f"Archivo {self.ARCHIVO_COTIZACIONES} no encontrado. Se inicia con listas vacías.")
                 return True
                 
         except json.JSONDecodeError as e:
             print(f"Error al decodificar el archivo JSON: {e}")
             # Si hay un error en el formato JSON, inicializar con listas vacías
-            self.cotizaciones_base = []
-            self.cotizaciones_disponibles = []
-            self.cotizaciones_seleccionadas = []
-            self.comentarios = {}
+            self._reiniciar_estado()
             return False
             
         except Exception as e:
             print(f"Error al cargar las cotizaciones: {e}")
             # En caso de cualquier otro error, inicializar con listas vacías
-            self.cotizaciones_base = []
-            self.cotizaciones_disponibles = []
-            self.cotizaciones_seleccionadas = []
-            self.comentarios = {}
+            self._reiniciar_estado()
             return False
     
     def guardar_cotizaciones_en_json(self):
@@ -115,31 +454,49 @@ class GestorCotizaciones:
             bool: True si se guardaron las cotizaciones, False si hubo algún error
         """
         try:
-            # Convertir de lista de tuplas a lista de diccionarios para el JSON
-            cotizaciones_json = []
+            ids = self._ids
+            comentarios = self.comentarios
             
-            for item in self.cotizaciones_base:
-                nombre, precio, categoria = item
-                
-                # Crear diccionario base con los campos obligatorios
-                cotizacion_dict = {
-                    "nombre": nombre, 
-                    "precio": precio, 
-                    "categoria": categoria
-                }
-                
-                # Añadir el comentario si existe
-                if item in self.comentarios:
-                    cotizacion_dict["comentario"] = self.comentarios[item]
-                else:
-                    cotizacion_dict["comentario"] = ""  # Guardar campo vacío por defecto
-                
-                cotizaciones_json.append(cotizacion_dict)
-            
-            # Guardar en el archivo JSON
-            with open(self.ARCHIVO_COTIZACIONES, 'w', encoding='utf-8') as archivo:
-                json.dump(cotizaciones_json, archivo, ensure_ascii=False, indent=2)
+            # Escribir primero un archivo temporal y reemplazar el definitivo solo
+            # cuando esté completo en disco: un fallo a mitad de la escritura no
+            # deja un JSON truncado que impida la próxima carga
+            archivo_temporal = self.ARCHIVO_COTIZACIONES + ".tmp"
+            try:
+                with open(archivo_temporal, 'wb', buffering=_TAMANO_BUFFER_ESCRITURA) as archivo:
+                    # Escribir la lista por lotes de cotizaciones, sin construir antes
+                    # la lista de diccionarios ni el documento completo en memoria.
+                    # Cada lote se codifica como lista y se escribe sin sus corchetes:
+                    # el resultado es el mismo que volcar la lista entera de una vez.
+                    escribir = archivo.write
+                    base = self.cotizaciones_base
+                    escribir(b'[')
+                    separador = b''
+                    for inicio in range(0, len(base), _COTIZACIONES_POR_LOTE_JSON):
+                        lote = [
+                            {
+                                "nombre": item[0],
+                                "precio": item[1],
+                                "categoria": item[2],
+                                # Añadir el comentario si existe (campo vacío por defecto)
+                                "comentario": comentarios.get(ids.get(item), "")
+                            }
+                            for item in base[inicio:inicio + _COTIZACIONES_POR_LOTE_JSON]
+                        ]
+                        escribir(separador)
+                        escribir(_volcar_json(lote)[1:-1])
+                        separador = b','
+                    escribir(b']')
+                    
+                    archivo.flush()
+                    os.fsync(archivo.fileno())
+                os.replace(archivo_temporal, self.ARCHIVO_COTIZACIONES)
+            except BaseException:
+                # No dejar el temporal a medio escribir junto al archivo
+                if os.path.exists(archivo_temporal):
+                    os.remove(archivo_temporal)
+                raise
                 
+            self._cambios_pendientes = False
             print(f"Cotizaciones guardadas en {self.ARCHIVO_COTIZACIONES}: {len(self.cotizaciones_base)} items")
             return True
             
@@ -147,6 +504,39 @@ class GestorCotizaciones:
             print(f"Error al guardar las cotizaciones: {e}")
             return False
             
+    def _guardar_cambios(self):
+        """
+        Guarda el JSON tras una modificación, salvo dentro de un bloque lote(),
+        donde el guardado se pospone hasta el cierre del bloque.
+        
+        Returns:
+            bool: Resultado del guardado, o True si quedó pendiente
+        """
+        self._cambios_pendientes = True
+        if self._lotes_abiertos:
+            return True
+        return self.guardar_cotizaciones_en_json()
+    
+    @contextmanager
+    def lote(self):
+        """
+        Agrupa varias modificaciones para escribir el archivo JSON una sola vez.
+        Los bloques pueden anidarse; el guardado ocurre al cerrar el más externo
+        y solo si hubo cambios.
+        
+        Uso:
+            with gestor.lote():
+                gestor.establecer_comentario(item1, "...")
+                gestor.establecer_comentario(item2, "...")
+        """
+        self._lotes_abiertos += 1
+        try:
+            yield self
+        finally:
+            self._lotes_abiertos -= 1
+            if not self._lotes_abiertos and self._cambios_pendientes:
+                self.guardar_cotizaciones_en_json()
+    
     def cargar_cotizaciones_iniciales(self, cotizaciones_iniciales=None):
         """
         Carga las cotizaciones iniciales al sistema.
@@ -159,26 +549,77 @@ class GestorCotizaciones:
         if self.cotizaciones_base:
             return
             
-        # Si se proporcionan cotizaciones iniciales, utilizarlas
+        # Si se proporcionan cotizaciones iniciales, utilizarlas (sin repetidas)
         if cotizaciones_iniciales:
-            self.cotizaciones_base = list(cotizaciones_iniciales)
+            self.cotizaciones_base = list(dict.fromkeys(Cotizacion(*item) for item in cotizaciones_iniciales))
             self.cotizaciones_disponibles = list(self.cotizaciones_base)
             self.cotizaciones_seleccionadas = []
+            self._seleccionadas = set()
+            self._total = 0.0
+            self._categorias = None
+            self._cotizaciones_por_categoria = None
+            for item in self.cotizaciones_base:
+                self._registrar_cotizacion(item)
             
             # Guardar las cotizaciones iniciales en el JSON
-            self.guardar_cotizaciones_en_json()
-        # Si ya hay cotizaciones cargadas, no hacer nada
-        if self.cotizaciones_base:
-            return
-            
-        # Si se proporcionan cotizaciones iniciales, utilizarlas
-        if cotizaciones_iniciales:
-            self.cotizaciones_base = list(cotizaciones_iniciales)
-            self.cotizaciones_disponibles = list(self.cotizaciones_base)
-            self.cotizaciones_seleccionadas = []
+            self._guardar_cambios()
+    
+    def obtener_precio_formateado(self, item):
+        """
+        Obtiene el precio de una cotización formateado con dos decimales.
+        El texto se calcula la primera vez y se reutiliza en las siguientes llamadas.
+        
+        Args:
+            item: Tupla (nombre, precio, categoria) de la cotización
             
-            # Guardar las cotizaciones iniciales en el JSON
-            self.guardar_cotizaciones_en_json()
+        Returns:
+            str: Precio formateado, por ejemplo "25000.00"
+        """
+        precio_formateado = self._precios_formateados.get(item)
+        if precio_formateado is None:
+            precio_formateado = f"{item[1]:.2f}"
+            self._precios_formateados[item] = precio_formateado
+        return precio_formateado
+    
+    @property
+    def items_base(self):
+        """
+        Vista de solo lectura de las cotizaciones base, mantenida por el gestor.
+        Permite comprobar si un ítem pertenece a la base sin copiar la lista.
+        
+        Returns:
+            KeysView: Tuplas (nombre, precio, categoria) de la base
+        """
+        return self._ids.keys()
+    
+    @property
+    def categorias(self):
+        """
+        Categorías únicas de las cotizaciones base, ordenadas alfabéticamente.
+        Se calculan solo cuando la base cambió desde la última consulta.
+        
+        Returns:
+            tuple: Tupla ordenada de categorías únicas
+        """
+        if self._categorias is None:
+            # Las claves del índice por categoría ya son las categorías únicas
+            self._categorias = tuple(sorted(self._obtener_cotizaciones_por_categoria()))
+        return self._categorias
+    
+    def _obtener_cotizaciones_por_categoria(self):
+        """
+        Devuelve el índice {categoria: [cotizaciones]} de la base, construyéndolo
+        solo si la base cambió desde la última consulta.
+        
+        Returns:
+            dict: Listas de cotizaciones base agrupadas por categoría
+        """
+        if self._cotizaciones_por_categoria is None:
+            indice = {}
+            for item in self.cotizaciones_base:
+                indice.setdefault(item[2], []).append(item)
+            self._cotizaciones_por_categoria = indice
+        return self._cotizaciones_por_categoria
     
     def obtener_categorias_unicas(self):
         """
@@ -187,7 +628,7 @@ class GestorCotizaciones:
         Returns:
             list: Lista ordenada de categorías únicas
         """
-        return sorted(set(categoria for _, _, categoria in self.cotizaciones_base))
+        return list(self.categorias)
     
     def filtrar_disponibles_por_categoria(self, categoria):
         """
@@ -199,16 +640,16 @@ class GestorCotizaciones:
         Returns:
             list: Lista filtrada de cotizaciones disponibles
         """
-        # Si la categoría es "Todas", mostrar todas las cotizaciones
+        # Si la categoría es "Todas", partir de todas las cotizaciones;
+        # si no, solo del grupo ya calculado para la categoría seleccionada
         if categoria == "Todas":
-            self.cotizaciones_disponibles = [(nombre, precio, cat) 
-                                           for nombre, precio, cat in self.cotizaciones_base
-                                           if (nombre, precio, cat) not in self.cotizaciones_seleccionadas]
+            candidatas = self.cotizaciones_base
         else:
-            # Filtrar por la categoría seleccionada
-            self.cotizaciones_disponibles = [(nombre, precio, cat) 
-                                           for nombre, precio, cat in self.cotizaciones_base
-                                           if cat == categoria and (nombre, precio, cat) not in self.cotizaciones_seleccionadas]
+            candidatas = self._obtener_cotizaciones_por_categoria().get(categoria, [])
+        
+        # Excluir las que ya están en la cotización actual
+        seleccionadas = self._seleccionadas
+        self.cotizaciones_disponibles = [item for item in candidatas if item not in seleccionadas]
         
         return self.cotizaciones_disponibles
     
@@ -222,12 +663,16 @@ class GestorCotizaciones:
         Returns:
             bool: True si se agregó correctamente, False si ya existía
         """
-        if item in self.cotizaciones_seleccionadas:
+        if item in self._seleccionadas:
             return False
         
+        self._seleccionadas.add(item)
+        self._total += item[1]
         self.cotizaciones_seleccionadas.append(item)
-        if item in self.cotizaciones_disponibles:
+        try:
             self.cotizaciones_disponibles.remove(item)
+        except ValueError:
+            pass  # No estaba entre las disponibles (por ejemplo, por el filtro)
         
         # No es necesario guardar en JSON aquí, ya que solo se mueve un ítem entre listas
         # y la base de cotizaciones no cambia
@@ -243,7 +688,19 @@ class GestorCotizaciones:
         Returns:
             str: El comentario asociado o cadena vacía si no existe
         """
-        return self.comentarios.get(item, "")
+        return self.comentarios.get(self._ids.get(item), "")
+    
+    def obtener_comentario_por_id(self, id_cotizacion):
+        """
+        Obtiene el comentario de una cotización a partir de su identificador.
+        
+        Args:
+            id_cotizacion: Identificador entero devuelto por obtener_id
+            
+        Returns:
+            str: El comentario asociado o cadena vacía si no existe
+        """
+        return self.comentarios.get(id_cotizacion, "")
     
     def establecer_comentario(self, item, comentario):
         """
@@ -254,12 +711,17 @@ class GestorCotizaciones:
             comentario: Texto del comentario a establecer
             
         Returns:
-            bool: True si se estableció correctamente
+            bool: True si se estableció correctamente, False si la cotización
+                no está en la base
         """
-        self.comentarios[item] = comentario
+        id_cotizacion = self._ids.get(item)
+        if id_cotizacion is None:
+            return False
+        
+        self.comentarios[id_cotizacion] = comentario
         
         # Guardar los cambios en el archivo JSON
-        return self.guardar_cotizaciones_en_json()
+        return self._guardar_cambios()
     
     def quitar_de_seleccionadas(self, item):
         """
@@ -271,11 +733,16 @@ class GestorCotizaciones:
         Returns:
             bool: True si se quitó correctamente, False si no existía
         """
-        if item not in self.cotizaciones_seleccionadas:
+        if item not in self._seleccionadas:
             return False
         
+        self._seleccionadas.discard(item)
         self.cotizaciones_seleccionadas.remove(item)
-        if item in self.cotizaciones_base and item not in self.cotizaciones_disponibles:
+        self._recalcular_total()
+        
+        # Una cotización seleccionada nunca figura entre las disponibles, así que
+        # basta con comprobar que siga en la base (tiene identificador)
+        if item in self._ids:
             self.cotizaciones_disponibles.append(item)
         
         # No es necesario guardar en JSON aquí, ya que solo se mueve un ítem entre listas
@@ -285,11 +752,20 @@ class GestorCotizaciones:
     def calcular_total(self):
         """
         Calcula el total de las cotizaciones seleccionadas.
+        El total se acumula al agregar ítems y se vuelve a sumar al quitarlos.
         
         Returns:
             float: Suma de los precios de las cotizaciones seleccionadas
         """
-        return sum(precio for _, precio, _ in self.cotizaciones_seleccionadas)
+        return self._total
+    
+    def _recalcular_total(self):
+        """
+        Vuelve a sumar el total tras quitar una cotización de la selección.
+        math.fsum da la suma exacta de los precios restantes, sin arrastrar el
+        error de redondeo de las sumas y restas anteriores.
+        """
+        self._total = math.fsum(precio for _, precio, _ in self._seleccionadas)
     
     def nueva_cotizacion(self):
         """
@@ -298,6 +774,8 @@ class GestorCotizaciones:
         # Restaurar todas las cotizaciones a disponibles
         self.cotizaciones_disponibles = list(self.cotizaciones_base)
         self.cotizaciones_seleccionadas = []
+        self._seleccionadas = set()
+        self._total = 0.0
         
         # No es necesario guardar en JSON aquí, ya que solo se reinician las listas
         # y la base de cotizaciones no cambia
@@ -313,47 +791,33 @@ class GestorCotizaciones:
             categoria: Categoría de la cotización
             
         Returns:
-            tuple: La nueva cotización agregada como (nombre, precio, categoria)
+            Cotizacion: La nueva cotización agregada como (nombre, precio, categoria),
+                o None si ya existe una idéntica en la base
         """
-        nueva_cotizacion = (nombre, precio, categoria)
+        categoria = sys.intern(categoria)
+        nueva_cotizacion = Cotizacion(nombre, precio, categoria)
+        
+        # La base no admite cotizaciones repetidas
+        if nueva_cotizacion in self._ids:
+            return None
         
         # Agregar a las listas
         self.cotizaciones_base.append(nueva_cotizacion)
         self.cotizaciones_disponibles.append(nueva_cotizacion)
+        self._registrar_cotizacion(nueva_cotizacion)
+        
+        # Actualizar las categorías y los grupos por categoría ya calculados
+        if self._categorias is not None and categoria not in self._categorias:
+            posicion = bisect.bisect_left(self._categorias, categoria)
+            self._categorias = self._categorias[:posicion] + (categoria,) + self._categorias[posicion:]
+        if self._cotizaciones_por_categoria is not None:
+            self._cotizaciones_por_categoria.setdefault(categoria, []).append(nueva_cotizacion)
         
         # Guardar los cambios en el archivo JSON
-        self.guardar_cotizaciones_en_json()
+        self._guardar_cambios()
         
         return nueva_cotizacion
     
-    def obtener_comentario(self, item):
-        """
-        Obtiene el comentario asociado a una cotización.
-        
-        Args:
-            item: Tupla (nombre, precio, categoria) de la cotización
-            
-        Returns:
-            str: El comentario asociado o cadena vacía si no existe
-        """
-        return self.comentarios.get(item, "")
-    
-    def establecer_comentario(self, item, comentario):
-        """
-        Establece o actualiza el comentario para una cotización.
-        
-        Args:
-            item: Tupla (nombre, precio, categoria) de la cotización
-            comentario: Texto del comentario a establecer
-            
-        Returns:
-            bool: True si se estableció correctamente
-        """
-        self.comentarios[item] = comentario
-        
-        # Guardar los cambios en el archivo JSON
-        return self.guardar_cotizaciones_en_json()
-    
     def eliminar_cotizacion_base(self, item):
         """
         Elimina una cotización de la lista base y de cualquier otra lista donde esté.
@@ -365,7 +829,9 @@ class GestorCotizaciones:
         Returns:
             bool: True si se eliminó correctamente, False si no existía
         """
-        if item not in self.cotizaciones_base:
+        # Cada cotización de la base tiene un único identificador (no hay repetidas)
+        id_cotizacion = self._ids.get(item)
+        if id_cotizacion is None:
             return False
         
         # Eliminar de todas las listas
@@ -374,22 +840,48 @@ class GestorCotizaciones:
         if item in self.cotizaciones_disponibles:
             self.cotizaciones_disponibles.remove(item)
             
-        if item in self.cotizaciones_seleccionadas:
+        if item in self._seleccionadas:
+            self._seleccionadas.discard(item)
             self.cotizaciones_seleccionadas.remove(item)
-        
-        # Eliminar comentario si existe
-        if item in self.comentarios:
-            del self.comentarios[item]
+            self._recalcular_total()
+        
+        # Descartar el identificador, el comentario si existe y el precio formateado en caché
+        del self._ids[item]
+        del self.cotizaciones_por_id[id_cotizacion]
+        self.comentarios.pop(id_cotizacion, None)
+        self._precios_formateados.pop(item, None)
+        
+        # Quitar la cotización de su grupo; si la categoría quedó vacía,
+        # quitarla también de las categorías. Sin índice, recalcular más tarde.
+        if self._cotizaciones_por_categoria is None:
+            self._categorias = None
+        else:
+            categoria = item[2]
+            grupo = self._cotizaciones_por_categoria[categoria]
+            grupo.remove(item)
+            if not grupo:
+                del self._cotizaciones_por_categoria[categoria]
+                if self._categorias is not None:
+                    self._categorias = tuple(c for c in self._categorias if c != categoria)
         
         # Guardar los cambios en el archivo JSON
-        self.guardar_cotizaciones_en_json()
+        self._guardar_cambios()
         
         return True
     
-    def exportar_a_excel(self):
+    def exportar_a_excel(self, cotizaciones=None, total=None):
         """
         Exporta la cotización actual a un archivo Excel.
         
+        Para exportar desde otro hilo, el llamador debe pasar una copia de la
+        selección y su total tomados en el hilo que la modifica: la exportación
+        no debe recorrer una lista que cambia mientras se escribe el archivo.
+        
+        Args:
+            cotizaciones: Tuplas (nombre, precio, categoria) a exportar; por defecto
+                las cotizaciones seleccionadas
+            total: Total de esas cotizaciones; por defecto calcular_total()
+            
         Returns:
             dict: Diccionario con información sobre el resultado de la exportación
                   {
@@ -398,92 +890,82 @@ class GestorCotizaciones:
                       'mensaje': 'mensaje de error' (si exito=False)
                   }
         """
-        if not OPENPYXL_DISPONIBLE:
-            return {
-                "exito": False,
-                "mensaje": "El módulo 'openpyxl' no está instalado."
-            }
+        if cotizaciones is None:
+            cotizaciones = self.cotizaciones_seleccionadas
+        if total is None:
+            total = self.calcular_total()
         
-        if not self.cotizaciones_seleccionadas:
+        if not cotizaciones:
             return {
                 "exito": False,
                 "mensaje": "No hay items en la cotización actual."
             }
         
+        # Las cotizaciones muy grandes, o todas si openpyxl no está instalado,
+        # se escriben directamente en XML
+        exportacion_directa = (not OPENPYXL_DISPONIBLE
+                               or len(cotizaciones) > UMBRAL_EXPORTACION_DIRECTA)
+        
         try:
-            # Crear un nuevo libro de trabajo
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Cotización"
+            # Generar nombre de archivo con fecha y hora, en el directorio actual
+            fecha_hora = datetime.now().strftime("%Y%m%d_%H%M")
+            nombre_archivo = f"cotizacion_{fecha_hora}.xlsx"
+            ruta_completa = os.path.join(os.getcwd(), nombre_archivo)
             
-            # Definir estilos
-            estilo_encabezado = Font(bold=True, size=12)
-            estilo_total = Font(bold=True, size=12)
-            borde = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            alineacion_centro = Alignment(horizontal='center')
-            alineacion_derecha = Alignment(horizontal='right')
+            # Cotizaciones muy grandes: escribir el XML directamente
+            if exportacion_directa:
+                _exportar_xlsx_directo(ruta_completa, cotizaciones, total)
+                return {
+                    "exito": True,
+                    "archivo": ruta_completa
+                }
             
-            # Añadir encabezados
-            encabezados = ["Descripción", "Precio (CRC)", "Categoría"]
-            for col, encabezado in enumerate(encabezados, start=1):
-                celda = ws.cell(row=1, column=col, value=encabezado)
-                celda.font = estilo_encabezado
-                celda.alignment = alineacion_centro
-                celda.border = borde
+            (openpyxl, WriteOnlyCell, fuente_negrita, borde_fino,
+             alineacion_centro, alineacion_derecha) = _cargar_openpyxl()
+            
+            # Crear un libro en modo de solo escritura: las filas se escriben en
+            # secuencia sin mantener en memoria un modelo completo de la hoja
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Cotización")
             
-            # Ajustar ancho de columnas
+            # Ajustar ancho de columnas (en modo de solo escritura, antes de añadir filas)
             ws.column_dimensions['A'].width = 40  # Descripción
             ws.column_dimensions['B'].width = 15  # Precio
             ws.column_dimensions['C'].width = 25  # Categoría
             
-            # Añadir los datos de las cotizaciones
-            for idx, (nombre, precio, categoria) in enumerate(self.cotizaciones_seleccionadas, start=2):
-                # Descripción
-                celda = ws.cell(row=idx, column=1, value=nombre)
-                celda.border = borde
-                
-                # Precio - formateo especial para números
-                celda = ws.cell(row=idx, column=2, value=precio)
-                celda.number_format = ' ##0.00'
-                celda.alignment = alineacion_derecha
-                celda.border = borde
-                
-                # Categoría
-                celda = ws.cell(row=idx, column=3, value=categoria)
-                celda.border = borde
-            
-            # Calcular el total
-            fila_total = len(self.cotizaciones_seleccionadas) + 2
-            total = self.calcular_total()
-            
-            # Celda "Total:"
-            celda = ws.cell(row=fila_total, column=1, value="TOTAL:")
-            celda.font = estilo_total
-            celda.alignment = alineacion_derecha
-            celda.border = borde
+            def crear_celda(valor, fuente=None, alineacion=None, formato=None):
+                """Crea una celda con borde y, opcionalmente, fuente, alineación y formato."""
+                celda = WriteOnlyCell(ws, value=valor)
+                celda.border = borde_fino
+                if fuente is not None:
+                    celda.font = fuente
+                if alineacion is not None:
+                    celda.alignment = alineacion
+                if formato is not None:
+                    celda.number_format = formato
+                return celda
             
-            # Celda con el valor del total
-            celda = ws.cell(row=fila_total, column=2, value=total)
-            celda.font = estilo_total
-            celda.number_format = '#0.00'
-            celda.alignment = alineacion_derecha
-            celda.border = borde
+            # Añadir encabezados
+            encabezados = ["Descripción", "Precio (CRC)", "Categoría"]
+            ws.append([crear_celda(encabezado, fuente_negrita, alineacion_centro)
+                       for encabezado in encabezados])
             
-            # Celda vacía en la columna de categoría (para completar la fila del total)
-            celda = ws.cell(row=fila_total, column=3, value="")
-            celda.border = borde
+            # Añadir los datos de las cotizaciones, una fila por llamada
+            for nombre, precio, categoria in cotizaciones:
+                ws.append([
+                    crear_celda(nombre),  # Descripción
+                    crear_celda(precio, alineacion=alineacion_derecha, formato=' ##0.00'),  # Precio
+                    crear_celda(categoria)  # Categoría
+                ])
             
-            # Generar nombre de archivo con fecha y hora
-            fecha_hora = datetime.now().strftime("%Y%m%d_%H%M")
-            nombre_archivo = f"cotizacion_{fecha_hora}.xlsx"
+            # Fila del total: etiqueta, valor y celda vacía en la columna de categoría
+            ws.append([
+                crear_celda("TOTAL:", fuente_negrita, alineacion_derecha),
+                crear_celda(total, fuente_negrita, alineacion_derecha, '#0.00'),
+                crear_celda("")
+            ])
             
-            # Guardar el archivo en el directorio actual
-            ruta_completa = os.path.join(os.getcwd(), nombre_archivo)
+            # Guardar el archivo
             wb.save(ruta_completa)
             
             return {
@@ -1,6 +1,22 @@
 """
 Punto de entrada principal para la aplicación de cotizaciones.
 Inicia la interfaz y el sistema de cotizaciones.
+
+Dependencias opcionales (la aplicación funciona sin ellas):
+
+    pip install openpyxl  # exportación a Excel con openpyxl
+    pip install orjson    # lectura y escritura más rápidas del archivo JSON
+    pip install ijson     # lectura por partes de archivos JSON grandes
+
+Para distribuir la aplicación como ejecutable (y reducir el tiempo de
+arranque en frío al evitar importar los módulos desde el código fuente)
+se puede compilar este archivo con Nuitka:
+
+    python -m nuitka --standalone --enable-plugin=tk-inter main.py
+
+o empaquetarlo con PyInstaller:
+
+    pyinstaller --onedir --windowed main.py
 """
 
 import tkinter as tk